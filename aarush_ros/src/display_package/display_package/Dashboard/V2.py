@@ -1,13 +1,23 @@
 import sys
+import time
+import threading
+from queue import Queue, Empty
 import cv2
+import numpy as np
 from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QLabel, QPushButton, QVBoxLayout, QStackedWidget
-from PyQt5.QtGui import QPixmap, QIcon, QImage, QPalette, QBrush, QPainter, QFont
+from PyQt5.QtGui import QPixmap, QIcon, QImage, QPalette, QBrush, QPainter, QFont, QFontMetrics
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QRect, QUrl, QTimer
 from PyQt5.QtWebEngineWidgets import QWebEngineView
 
+# horizontalAdvance() only exists from Qt 5.11, older images fall back to the deprecated width()
+text_width = getattr(QFontMetrics, 'horizontalAdvance', QFontMetrics.width)
+
 
 
 class MainWindow(QMainWindow):
+    # Background brush is shared by every window instance, decoded on first use
+    _BG_BRUSH = None
+
     def __init__(self):
         super().__init__()
 
@@ -15,92 +25,94 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(self.central_widget)
         self.setFixedSize(1024, 600)
 
-        pixmap = QPixmap("/home/veadesh/Agnirath/GUI/Beaglebone/Dashboard/assets/Bg.png")
+        if MainWindow._BG_BRUSH is None:
+            MainWindow._BG_BRUSH = QBrush(QPixmap("/home/veadesh/Agnirath/GUI/Beaglebone/Dashboard/assets/Bg.png"))
         self.central_widget.setAutoFillBackground(True)
         palette = self.central_widget.palette()
-        palette.setBrush(QPalette.Window, QBrush(pixmap))
+        palette.setBrush(QPalette.Window, MainWindow._BG_BRUSH)
         self.central_widget.setPalette(palette)
 
+        # Shared look for the orange text labels, each label just picks a kind
+        self.setStyleSheet(
+            "QLabel[kind=\"heading\"], QLabel[kind=\"caption\"] {"
+            "font-family: 'Good Times'; font-weight: 400; line-height: 48px; letter-spacing: 0em; "
+            "color: #F97110; background-color: #161F28 }"
+            "QLabel[kind=\"heading\"] { font-size: 32px }"
+            "QLabel[kind=\"caption\"] { font-size: 25px }")
+
+        # Every section heading uses one of two underline widths, decode the asset once
+        underline = QPixmap("/home/veadesh/Agnirath/GUI/Beaglebone/Dashboard/assets/underline.png")
+        self._ul_220 = underline.scaled(220, 9)
+        self._ul_450 = underline.scaled(450, 9)
+
         self.camera_label = QLabel(self)
         self.cam = Camera()
 
         self.dist_label = QLabel(self)
         self.dist_label.setGeometry(QRect(840, 24, 150, 50))
         self.dist_label.setAlignment(Qt.AlignCenter)
-        self.dist_label.setStyleSheet("font-family: 'Good Times'; font-size: 25px; font-weight: 400; "
-                                        "line-height: 48px; letter-spacing: 0em; color: #F97110; "
-                                        "background-color: #161F28")
+        self.dist_label.setProperty("kind", "caption")
         self.dist_label.setText("DISTANCE")
 
         self.solar1 = QLabel(self)
         self.solar1.setGeometry(QRect(218, 57, 200, 36))
         self.solar1.setAlignment(Qt.AlignCenter)
-        self.solar1.setStyleSheet("font-family: 'Good Times'; font-size: 32px; font-weight: 400; "
-                                        "line-height: 48px; letter-spacing: 0em; color: #F97110; "
-                                        "background-color: #161F28")
+        self.solar1.setProperty("kind", "heading")
         self.solar1.setText("COCKPIT")
         self.solar1.hide()
 
         self.solar1_ul = QLabel(self)
         self.solar1_ul.setGeometry(212, 100 , 220, 9)
-        self.solar1_ul.setPixmap(QPixmap("/home/veadesh/Agnirath/GUI/Beaglebone/Dashboard/assets/underline.png").scaled(220, 9))
+        self.solar1_ul.setPixmap(self._ul_220)
         self.solar1_ul.hide()
 
         self.solar3 = QLabel(self)
         self.solar3.setGeometry(QRect(744,57,200,36))
         self.solar3.setAlignment(Qt.AlignCenter)
-        self.solar3.setStyleSheet("font-family: 'Good Times'; font-size: 32px; font-weight: 400; "
-                                        "line-height: 48px; letter-spacing: 0em; color: #F97110; "
-                                        "background-color: #161F28")
+        self.solar3.setProperty("kind", "heading")
         self.solar3.setText("MOTOR")
         self.solar3.hide()
 
         self.solar3_ul = QLabel(self)
         self.solar3_ul.setGeometry(744,100, 220, 9)
-        self.solar3_ul.setPixmap(QPixmap("/home/veadesh/Agnirath/GUI/Beaglebone/Dashboard/assets/underline.png").scaled(220, 9))
+        self.solar3_ul.setPixmap(self._ul_220)
         self.solar3_ul.hide()
 
 
         self.solar4 = QLabel(self)
         self.solar4.setGeometry(QRect(218, 337, 450, 36))
         self.solar4.setAlignment(Qt.AlignCenter)
-        self.solar4.setStyleSheet("font-family: 'Good Times'; font-size: 32px; font-weight: 400; "
-                                        "line-height: 48px; letter-spacing: 0em; color: #F97110; "
-                                        "background-color: #161F28")
+        self.solar4.setProperty("kind", "heading")
         self.solar4.setText("MOTOR CONTROLLER")
         self.solar4.hide()
 
         self.solar4_ul = QLabel(self)
         self.solar4_ul.setGeometry(218,376, 450, 9)
-        self.solar4_ul.setPixmap(QPixmap("/home/veadesh/Agnirath/GUI/Beaglebone/Dashboard/assets/underline.png").scaled(450, 9))
+        self.solar4_ul.setPixmap(self._ul_450)
         self.solar4_ul.hide()
 
         self.mppt_temp = QLabel(self)
         self.mppt_temp.setGeometry(QRect(754, 337, 200, 36))
         self.mppt_temp.setAlignment(Qt.AlignCenter)
-        self.mppt_temp.setStyleSheet("font-family: 'Good Times'; font-size: 32px; font-weight: 400; "
-                                        "line-height: 48px; letter-spacing: 0em; color: #F97110; "
-                                        "background-color: #161F28")
+        self.mppt_temp.setProperty("kind", "heading")
         self.mppt_temp.setText("BATTERY")
         self.mppt_temp.hide()
 
         self.mppt_temp_ul = QLabel(self)
         self.mppt_temp_ul.setGeometry(744,380, 220, 9)
-        self.mppt_temp_ul.setPixmap(QPixmap("/home/veadesh/Agnirath/GUI/Beaglebone/Dashboard/assets/underline.png").scaled(220, 9))
+        self.mppt_temp_ul.setPixmap(self._ul_220)
         self.mppt_temp_ul.hide()
 
         self.motor_current = QLabel(self)
         self.motor_current.setGeometry(QRect(430, 50, 200, 36))
         self.motor_current.setAlignment(Qt.AlignCenter)
-        self.motor_current.setStyleSheet("font-family: 'Good Times'; font-size: 32px; font-weight: 400; "
-                                        "line-height: 48px; letter-spacing: 0em; color: #F97110; "
-                                        "background-color: #161F28")
+        self.motor_current.setProperty("kind", "heading")
         self.motor_current.setText("MOTOR")
         self.motor_current.hide()
 
         self.motor_current_ul = QLabel(self)
         self.motor_current_ul.setGeometry(430,90, 200, 9)
-        self.motor_current_ul.setPixmap(QPixmap("/home/veadesh/Agnirath/GUI/Beaglebone/Dashboard/assets/underline.png").scaled(220, 9))
+        self.motor_current_ul.setPixmap(self._ul_220)
         self.motor_current_ul.hide()
 
         self.motor_current_fr = QLabel(self)
@@ -110,15 +122,13 @@ class MainWindow(QMainWindow):
         self.motorctrl_current = QLabel(self)
         self.motorctrl_current.setGeometry(QRect(310, 220, 450, 36))
         self.motorctrl_current.setAlignment(Qt.AlignCenter)
-        self.motorctrl_current.setStyleSheet("font-family: 'Good Times'; font-size: 32px; font-weight: 400; "
-                                        "line-height: 48px; letter-spacing: 0em; color: #F97110; "
-                                        "background-color: #161F28")
+        self.motorctrl_current.setProperty("kind", "heading")
         self.motorctrl_current.setText("MOTOR CONTROLLER")
         self.motorctrl_current.hide()
 
         self.motorctrl_current_ul = QLabel(self)
         self.motorctrl_current_ul.setGeometry(310,260, 450, 9)
-        self.motorctrl_current_ul.setPixmap(QPixmap("/home/veadesh/Agnirath/GUI/Beaglebone/Dashboard/assets/underline.png").scaled(450, 9))
+        self.motorctrl_current_ul.setPixmap(self._ul_450)
         self.motorctrl_current_ul.hide()
 
         self.motorctrl_current_fr = QLabel(self)
@@ -128,15 +138,13 @@ class MainWindow(QMainWindow):
         self.battery_current = QLabel(self)
         self.battery_current.setGeometry(QRect(430, 390, 200, 36))
         self.battery_current.setAlignment(Qt.AlignCenter)
-        self.battery_current.setStyleSheet("font-family: 'Good Times'; font-size: 32px; font-weight: 400; "
-                                        "line-height: 48px; letter-spacing: 0em; color: #F97110; "
-                                        "background-color: #161F28")
+        self.battery_current.setProperty("kind", "heading")
         self.battery_current.setText("BATTERY")
         self.battery_current.hide()
 
         self.battery_current_ul = QLabel(self)
         self.battery_current_ul.setGeometry(430,430, 200, 9)
-        self.battery_current_ul.setPixmap(QPixmap("/home/veadesh/Agnirath/GUI/Beaglebone/Dashboard/assets/underline.png").scaled(220, 9))
+        self.battery_current_ul.setPixmap(self._ul_220)
         self.battery_current_ul.hide()
 
         self.battery_current_fr = QLabel(self)
@@ -146,9 +154,7 @@ class MainWindow(QMainWindow):
         self.time_label = QLabel(self)
         self.time_label.setGeometry(QRect(825, 150, 180, 50))
         self.time_label.setAlignment(Qt.AlignCenter)
-        self.time_label.setStyleSheet("font-family: 'Good Times'; font-size: 25px; font-weight: 400; "
-                                        "line-height: 48px; letter-spacing: 0em; color: #F97110; "
-                                        "background-color: #161F28")
+        self.time_label.setProperty("kind", "caption")
         self.time_label.setText("DRIVE TIME")
 
         self.mapfr = QLabel(self)
@@ -201,6 +207,9 @@ class MainWindow(QMainWindow):
         self.motorcurrent_value = 0
         self.mtrctrl_value = 0
         self.batcurrent_value = 0
+        # battery, temps, distance, motor, motor controller and battery current, in that order
+        self._counters = np.zeros(6, dtype=np.int32)
+        self._caps = np.array([100, 80, 3050, 20, 25, 30], dtype=np.int32)
         self.time_str = "00:00:00"
         self.seconds = 0
         self.battery_images = ['/home/veadesh/Agnirath/GUI/Beaglebone/Dashboard/assets/battery0.png',
@@ -215,10 +224,26 @@ class MainWindow(QMainWindow):
                             '/home/veadesh/Agnirath/GUI/Beaglebone/Dashboard/assets/temphot.png'
                             ]
 
+        # Decode every asset display_image paints on once, the timer only copies them
+        self._frame_pix = QPixmap("/home/veadesh/Agnirath/GUI/Beaglebone/Dashboard/assets/Drive time frame.png")
+        self._battery_pix = [QPixmap(path) for path in self.battery_images]
+        self._temp_pix = [QPixmap(path) for path in self.temp_images]
+        self._rearview_frame = QPixmap("/home/veadesh/Agnirath/GUI/Beaglebone/Dashboard/assets/Rearviewframe.png")
+        self._overlay_buf = QImage(self._rearview_frame.size(), QImage.Format_ARGB32)
+        self._font20 = QFont('Good Times', 20)
+        self._font15 = QFont('Good Times', 15)
+        self._fm20 = QFontMetrics(self._font20)
+        self._fm15 = QFontMetrics(self._font15)
+
         self.camera_label.show()
         self.cam.ImageUpdate.connect(self.ImageUpdateSlot)
+        self.cam.finished.connect(self._camera_finished)
+        self._camera_wanted = True
         self.cam.start()
         self.camera_label.setGeometry(QRect(185, 340, 631 , 230))
+        # One web view for the map, the main view only shows and hides it
+        self.web_view = QWebEngineView(self)
+        self.web_view.setGeometry(QRect(191, 33, 619, 288))
         self.load_html_file("http://127.0.0.1:5500/GUI/Beaglebone/Dashboard/mapV2.html")
 
         self.battery_label = QLabel(self)
@@ -237,363 +262,283 @@ class MainWindow(QMainWindow):
         self.temp4_label.setGeometry(818,410,71,157)
         self.temp4_label.hide()
 
-
+        # Every painted reading: the labels showing it, where its value comes from, the image
+        # it is drawn on and how the text is laid out. 'last' holds the value currently shown.
+        frame = lambda value: self._frame_pix
+        self._value_slots = {
+            'battery': {'labels': (self.battery_label,), 'get': lambda: self.battery,
+                        'pix': self._battery_image, 'fmt': str,
+                        'font': self._font20, 'fm': self._fm20, 'y': None, 'size': (143, 216)},
+            'temps': {'labels': (self.temp1_label, self.temp2_label, self.temp3_label, self.temp4_label),
+                      'get': lambda: self.temps, 'pix': self._temp_image, 'fmt': str,
+                      'font': self._font20, 'fm': self._fm20, 'y': 145, 'size': (71, 157)},
+            'motor': {'labels': (self.motor_current_fr,), 'get': lambda: self.motorcurrent_value,
+                      'pix': frame, 'fmt': "{} AMP".format,
+                      'font': self._font20, 'fm': self._fm20, 'y': 43, 'size': (173, 63)},
+            'mtrctrl': {'labels': (self.motorctrl_current_fr,), 'get': lambda: self.mtrctrl_value,
+                        'pix': frame, 'fmt': "{} AMP".format,
+                        'font': self._font20, 'fm': self._fm20, 'y': 43, 'size': (173, 63)},
+            'batcurrent': {'labels': (self.battery_current_fr,), 'get': lambda: self.batcurrent_value,
+                           'pix': frame, 'fmt': "{} AMP".format,
+                           'font': self._font20, 'fm': self._fm20, 'y': 43, 'size': (173, 63)},
+            'distance': {'labels': (self.distfr,), 'get': lambda: self.distance,
+                         'pix': frame, 'fmt': "{} KM".format,
+                         'font': self._font20, 'fm': self._fm20, 'y': 43, 'size': (173, 63)},
+            'time': {'labels': (self.timefr,), 'get': lambda: self.time_str,
+                     'pix': frame, 'fmt': "{} HRs".format,
+                     'font': self._font15, 'fm': self._fm15, 'y': 43, 'size': (173, 63)},
+        }
+        for slot in self._value_slots.values():
+            slot['last'] = None
+
+        # The clock only repaints the drive time, readings repaint through the set_* slots
+        self.clock_timer = QTimer(self)
+        self.clock_timer.timeout.connect(self.tick_clock)
+        self.clock_timer.start(1000)
+
+        # Test mode: feed made-up readings through the same slots a data source would use
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.update_variable)
         self.timer.start(1000) 
 
-        self.button1_clicked = False
-        self.button2_clicked = False
-        self.button3_clicked = False
-        self.button4_clicked = False
-
-    def hide(self):
-        if self.button1_clicked:
-            self.camera_label.show()
-            self.cam.ImageUpdate.connect(self.ImageUpdateSlot)
-            self.cam.start()
-            self.camera_label.setGeometry(QRect(185, 340, 631 , 230))
-            self.dist_label.show()
-            self.time_label.show()
-            self.timefr.show()
-            self.distfr.show()
-            self.mapfr.show()
-            self.battery_label.show()
-            self.solar1.hide()
-            self.solar3.hide()
-            self.solar4.hide()
-            self.motor_current.hide()
-            self.mppt_temp.hide()
-            self.solar1_ul.hide()
-            self.solar3_ul.hide()
-            self.solar4_ul.hide()
-            self.motor_current_ul.hide()
-            self.mppt_temp_ul.hide()
-            self.temp1_label.hide()
-            self.temp2_label.hide()
-            self.temp3_label.hide()
-            self.temp4_label.hide()
-            self.motor_current_fr.hide()
-            self.motorctrl_current.hide()
-            self.motorctrl_current_ul.hide()
-            self.motorctrl_current_fr.hide()
-            self.battery_current.hide()
-            self.battery_current_ul.hide()
-            self.battery_current_fr.hide()
-            
-        if self.button2_clicked:
-            self.solar1.show()
-            self.solar3.show()
-            self.solar4.show()
-            self.mppt_temp.show()
-            self.solar1_ul.show()
-            self.solar3_ul.show()
-            self.solar4_ul.show()
-            self.mppt_temp_ul.show()
-            self.temp1_label.show()
-            self.temp2_label.show()
-            self.temp3_label.show()
-            self.temp4_label.show()
-            self.camera_label.hide()
-            self.cam.stop()
-            self.dist_label.hide()
-            self.time_label.hide()
-            self.timefr.hide()
-            self.distfr.hide()
-            self.mapfr.hide()
-            self.web_view.hide()
-            self.battery_label.hide()
-            self.motor_current.hide()
-            self.motor_current_ul.hide()
-            self.motor_current_fr.hide()
-            self.motorctrl_current.hide()
-            self.motorctrl_current_ul.hide()
-            self.motorctrl_current_fr.hide()
-            self.battery_current.hide()
-            self.battery_current_ul.hide()
-            self.battery_current_fr.hide()
-            
-
-        if self.button3_clicked:
-            self.motor_current.show()
-            self.motor_current_ul.show()
-            self.motor_current_fr.show()
-            self.motorctrl_current.show()
-            self.motorctrl_current_ul.show()
-            self.motorctrl_current_fr.show()
-            self.battery_current.show()
-            self.battery_current_ul.show()
-            self.battery_current_fr.show()
-            self.camera_label.hide()
+        # Widgets shown by each view, everything else in the table is hidden
+        self._views = {
+            'main': {self.camera_label, self.web_view, self.dist_label, self.time_label, self.timefr,
+                     self.distfr, self.mapfr, self.battery_label},
+            'temps': {self.solar1, self.solar3, self.solar4, self.mppt_temp,
+                      self.solar1_ul, self.solar3_ul, self.solar4_ul, self.mppt_temp_ul,
+                      self.temp1_label, self.temp2_label, self.temp3_label, self.temp4_label},
+            'current': {self.motor_current, self.motor_current_ul, self.motor_current_fr,
+                        self.motorctrl_current, self.motorctrl_current_ul, self.motorctrl_current_fr,
+                        self.battery_current, self.battery_current_ul, self.battery_current_fr},
+            'cpanel': set(),
+        }
+        self._all_toggleable = set().union(*self._views.values())
+
+    def _switch(self, name):
+        desired = self._views[name]
+        # The labels are children of the window, not central_widget, so suspend painting
+        # on the window and let the whole transition land in one repaint
+        self.setUpdatesEnabled(False)
+        try:
+            # Only touch widgets whose visibility actually changes
+            for widget in self._all_toggleable:
+                visible = widget in desired
+                if widget.isHidden() == visible:
+                    widget.setVisible(visible)
+            self.display_image()
+        finally:
+            self.setUpdatesEnabled(True)
+            self.update()
+
+        self._camera_wanted = name == 'main'
+        if not self._camera_wanted:
             self.cam.stop()
-            self.dist_label.hide()
-            self.time_label.hide()
-            self.timefr.hide()
-            self.distfr.hide()
-            self.mapfr.hide()
-            self.web_view.hide()
-            self.battery_label.hide()
-            self.solar1.hide()
-            self.solar3.hide()
-            self.solar4.hide()
-            self.mppt_temp.hide()
-            self.solar1_ul.hide()
-            self.solar3_ul.hide()
-            self.solar4_ul.hide()
-            self.mppt_temp_ul.hide()
-            self.temp1_label.hide()
-            self.temp2_label.hide()
-            self.temp3_label.hide()
-            self.temp4_label.hide()
-            
-
-        if self.button4_clicked:
-            self.camera_label.hide()
-            self.cam.stop()
-            self.dist_label.hide()
-            self.time_label.hide()
-            self.timefr.hide()
-            self.distfr.hide()
-            self.mapfr.hide()
-            self.web_view.hide()
-            self.battery_label.hide()
-            self.solar1.hide()
-            self.solar3.hide()
-            self.solar4.hide()
-            self.mppt_temp.hide()
-            self.solar1_ul.hide()
-            self.solar3_ul.hide()
-            self.solar4_ul.hide()
-            self.mppt_temp_ul.hide()
-            self.temp1_label.hide()
-            self.temp2_label.hide()
-            self.temp3_label.hide()
-            self.temp4_label.hide()
-            self.motor_current.hide()
-            self.motor_current_ul.hide()
-            self.motor_current_fr.hide()
-            self.motorctrl_current.hide()
-            self.motorctrl_current_ul.hide()
-            self.motorctrl_current_fr.hide()
-            self.battery_current.hide()
-            self.battery_current_ul.hide()
-            self.battery_current_fr.hide()
+        elif not self.cam.isRunning():
+            self.cam.start()
+        # Otherwise the camera thread may still be shutting down from the last stop(), and
+        # start() does nothing on a running QThread; _camera_finished restarts it instead
 
+    def _camera_finished(self):
+        # stop() only waits briefly, so a quick switch back to the main view can land
+        # before the thread has exited; pick it up again once it has
+        if self._camera_wanted:
+            self.cam.start()
 
     def update_variable(self):
-        self.battery += 1
-        self.temps += 1
-        self.distance += 1
-        self.motorcurrent_value += 1
-        self.mtrctrl_value += 1
-        self.batcurrent_value += 1
-        self.seconds += 1        
+        # Test-mode readings: step every counter and wrap each one past its cap
+        self._counters += 1
+        np.mod(self._counters, self._caps + 1, out=self._counters)
+        battery, temps, distance, motorcurrent, mtrctrl, batcurrent = self._counters.tolist()
+        self.set_battery(battery)
+        self.set_temps(temps)
+        self.set_distance(distance)
+        self.set_motor_current(motorcurrent)
+        self.set_mtrctrl_current(mtrctrl)
+        self.set_battery_current(batcurrent)
+
+    def _format_time(self):
         hours, rem = divmod(self.seconds, 3600)
         minutes, remaining_seconds = divmod(rem, 60)
         self.time_str = f"{hours:02d}:{minutes:02d}:{remaining_seconds:02d}"
-        print(self.time_str, end='\r')
-        self.display_image()
-        if self.battery >100:
-            self.battery = 0
-        if self.temps > 80:
-            self.temps = 0 
-        if self.distance > 3050:
-            self.distance = 0
-        if self.motorcurrent_value > 20:
-            self.motorcurrent_value = 0
-        if self.mtrctrl_value > 25:
-            self.mtrctrl_value = 0
-        if self.batcurrent_value > 30:
-            self.batcurrent_value = 0
 
-    def display_image(self):
-        image_index = self.battery // 20 % len(self.battery_images)
-        pixmap = QPixmap(self.battery_images[image_index])
+    def tick_clock(self):
+        self.seconds += 1
+        # Only the drive time frame shows time_str, skip formatting it while that view is away
+        if not self.timefr.isHidden():
+            self._format_time()
+            self._render_slot(self._value_slots['time'])
+
+    # Slots for incoming readings, each one repaints only its own widgets
+    def set_battery(self, value):
+        self.battery = value
+        self._render_slot(self._value_slots['battery'])
 
-        # Create a painter object for the battery image
+    def set_temps(self, value):
+        self.temps = value
+        self._render_slot(self._value_slots['temps'])
+
+    def set_distance(self, value):
+        self.distance = value
+        self._render_slot(self._value_slots['distance'])
+
+    def set_motor_current(self, value):
+        self.motorcurrent_value = value
+        self._render_slot(self._value_slots['motor'])
+
+    def set_mtrctrl_current(self, value):
+        self.mtrctrl_value = value
+        self._render_slot(self._value_slots['mtrctrl'])
+
+    def set_battery_current(self, value):
+        self.batcurrent_value = value
+        self._render_slot(self._value_slots['batcurrent'])
+
+    def _render_value(self, base_pix, text, font, fm, y, size):
+        pixmap = base_pix.copy()
         painter = QPainter(pixmap)
-        painter.setFont(QFont('Good Times', 20))  
-        painter.setPen(Qt.white)  
-
-        # Draw the battery variable text on the battery image
-        text_width = painter.fontMetrics().width(str(self.battery))
-        text_height = painter.fontMetrics().height()
-        x = (pixmap.width() - text_width) // 2
-        y = (pixmap.height() - text_height) // 2
-        painter.drawText(x, y, str(self.battery))
+        painter.setFont(font)
+        painter.setPen(Qt.white)
+        x = (pixmap.width() - text_width(fm, text)) // 2
+        painter.drawText(x, y, text)
         painter.end()
+        return pixmap.scaled(*size)
 
-        # Display the battery image
-        self.battery_label.setPixmap(pixmap.scaled(143, 216))
+    def _battery_image(self, battery):
+        return self._battery_pix[battery // 20 % len(self._battery_pix)]
 
+    def _temp_image(self, temps):
         # Determine the index for the temperature image
         temp_index = 0
-        if self.temps > 45 and self.temps < 60:
+        if temps > 45 and temps < 60:
             temp_index = 1
-        elif self.temps >= 60 and self.temps < 80:
+        elif temps >= 60 and temps < 80:
             temp_index = 2
+        return self._temp_pix[temp_index]
+
+    def _render_slot(self, slot):
+        value = slot['get']()
+        # Hidden labels and values that are already on screen are left alone
+        if slot['labels'][0].isHidden() or slot['last'] == value:
+            return
+        slot['last'] = value
+
+        base_pix = slot['pix'](value)
+        y = slot['y']
+        if y is None:
+            y = (base_pix.height() - slot['fm'].height()) // 2
+        pixmap = self._render_value(base_pix, slot['fmt'](value), slot['font'], slot['fm'], y, slot['size'])
+        # Labels in the same slot show the same reading, so they share one pixmap
+        for label in slot['labels']:
+            label.setPixmap(pixmap)
 
-        #Cocpit Temperature
-        pixmap_temp = QPixmap(self.temp_images[temp_index])
-        painter_temp = QPainter(pixmap_temp)
-        painter_temp.setFont(QFont('Good Times', 20))  
-        painter_temp.setPen(Qt.white)  
-        text_width_temp = painter_temp.fontMetrics().width(str(self.temps))
-        x_temp = (pixmap_temp.width() - text_width_temp) // 2
-        painter_temp.drawText(x_temp, 145, str(self.temps))
-        painter_temp.end()
-        self.temp1_label.setPixmap(pixmap_temp.scaled(71, 157))
-
-        #Motor Temperature
-        pixmap_temp2 = QPixmap(self.temp_images[temp_index])
-        painter_temp2 = QPainter(pixmap_temp2)
-        painter_temp2.setFont(QFont('Good Times', 20))
-        painter_temp2.setPen(Qt.white)  
-        text_width_temp2 = painter_temp2.fontMetrics().width(str(self.temps))
-        x_temp = (pixmap_temp2.width() - text_width_temp2) // 2
-        painter_temp2.drawText(x_temp, 145, str(self.temps))
-        painter_temp2.end()
-        self.temp2_label.setPixmap(pixmap_temp.scaled(71, 157))
-
-        #Motor Controller Temperature
-        pixmap_temp3 = QPixmap(self.temp_images[temp_index])
-        painter_temp3 = QPainter(pixmap_temp3)
-        painter_temp3.setFont(QFont('Good Times', 20)) 
-        painter_temp3.setPen(Qt.white)  
-        text_width_temp3 = painter_temp3.fontMetrics().width(str(self.temps))
-        x_temp = (pixmap_temp3.width() - text_width_temp3) // 2
-        painter_temp3.drawText(x_temp, 145, str(self.temps))
-        painter_temp3.end()
-        self.temp3_label.setPixmap(pixmap_temp.scaled(71, 157))
-
-        #Battery Temperature
-        pixmap_temp4 = QPixmap(self.temp_images[temp_index])
-        painter_temp4 = QPainter(pixmap_temp4)
-        painter_temp4.setFont(QFont('Good Times', 20)) 
-        painter_temp4.setPen(Qt.white)  
-        text_width_temp4 = painter_temp4.fontMetrics().width(str(self.temps))
-        x_temp = (pixmap_temp4.width() - text_width_temp4) // 2
-        painter_temp4.drawText(x_temp, 145, str(self.temps))
-        painter_temp4.end()
-        self.temp4_label.setPixmap(pixmap_temp.scaled(71, 157))
-
-        #Current of motor 
-        pixmap_motor = QPixmap("/home/veadesh/Agnirath/GUI/Beaglebone/Dashboard/assets/Drive time frame.png")
-        painter_motor = QPainter(pixmap_motor)
-        painter_motor.setFont(QFont('Good Times', 20))  
-        painter_motor.setPen(Qt.white)  
-        text_width_motor = painter_motor.fontMetrics().width(str(self.motorcurrent_value)+ " AMP")
-        x_temp = (pixmap_motor.width() - text_width_motor) // 2
-        painter_motor.drawText(x_temp, 43, str(self.motorcurrent_value)+ " AMP")
-        painter_motor.end()
-        self.motor_current_fr.setPixmap(pixmap_motor.scaled(173, 63))
-
-        #Current of motor controller
-        pixmap_motorctrl = QPixmap("/home/veadesh/Agnirath/GUI/Beaglebone/Dashboard/assets/Drive time frame.png")
-        painter_motorctrl = QPainter(pixmap_motorctrl)
-        painter_motorctrl.setFont(QFont('Good Times', 20))  # Set the font and size of the variable text
-        painter_motorctrl.setPen(Qt.white)  # Set the color of the variable text
-        text_width_motorctrl = painter_motorctrl.fontMetrics().width(str(self.mtrctrl_value) + " AMP")
-        x_temp = (pixmap_motorctrl.width() - text_width_motorctrl) // 2
-        painter_motorctrl.drawText(x_temp, 43, str(self.mtrctrl_value) + " AMP")
-        painter_motorctrl.end()
-        self.motorctrl_current_fr.setPixmap(pixmap_motorctrl.scaled(173, 63))
-
-        #Current of battery 
-        pixmap_battery = QPixmap("/home/veadesh/Agnirath/GUI/Beaglebone/Dashboard/assets/Drive time frame.png")
-        painter_battery = QPainter(pixmap_battery)
-        painter_battery.setFont(QFont('Good Times', 20))  # Set the font and size of the variable text
-        painter_battery.setPen(Qt.white)  # Set the color of the variable text
-        text_width_battery = painter_battery.fontMetrics().width(str(self.batcurrent_value)+ " AMP")
-        x_temp = (pixmap_battery.width() - text_width_battery) // 2
-        painter_battery.drawText(x_temp, 43, str(self.batcurrent_value)+ " AMP")
-        painter_battery.end()
-        self.battery_current_fr.setPixmap(pixmap_battery.scaled(173, 63))
-
-        #Distance Travelled
-        pixmap_distance = QPixmap("/home/veadesh/Agnirath/GUI/Beaglebone/Dashboard/assets/Drive time frame.png")
-        painter_distance = QPainter(pixmap_distance)
-        painter_distance.setFont(QFont('Good Times', 20))  # Set the font and size of the variable text
-        painter_distance.setPen(Qt.white)  # Set the color of the variable text
-        text_width_distance = painter_distance.fontMetrics().width(str(self.distance)+"KM")
-        x_temp = (pixmap_distance.width() - text_width_distance) // 2
-        painter_distance.drawText(x_temp, 43, str(self.distance)+" KM")
-        painter_distance.end()
-        self.distfr.setPixmap(pixmap_distance.scaled(173, 63))
-
-        #Time
-        # print(time_str, end='\r')
-        pixmap_time = QPixmap("/home/veadesh/Agnirath/GUI/Beaglebone/Dashboard/assets/Drive time frame.png")
-        painter_time = QPainter(pixmap_time)
-        painter_time.setFont(QFont('Good Times', 15))  # Set the font and size of the variable text
-        painter_time.setPen(Qt.white)  # Set the color of the variable text
-        text_width_time = painter_time.fontMetrics().width(self.time_str +" HRs")
-        x_temp = (pixmap_time.width() - text_width_time) // 2
-        painter_time.drawText(x_temp, 43, self.time_str + " HRs")
-        painter_time.end()
-        self.timefr.setPixmap(pixmap_time.scaled(173, 63))
+    def display_image(self):
+        # Readings that changed while their view was hidden were skipped, catch them up here.
+        # _render_slot still leaves the slots of the other views alone.
+        if not self.timefr.isHidden():
+            self._format_time()
+        for slot in self._value_slots.values():
+            self._render_slot(slot)
 
     def load_html_file(self, url):
-            self.web_view = QWebEngineView(self)
-            self.web_view.setGeometry(QRect(191, 33, 619, 288))
-            self.web_view.setUrl(QUrl(url))
-            self.web_view.show()
+        url = QUrl(url)
+        if self.web_view.url() != url:
+            self.web_view.setUrl(url)
+        self.web_view.show()
 
     def ImageUpdateSlot(self, image):
-        frame_image = QPixmap("/home/veadesh/Agnirath/GUI/Beaglebone/Dashboard/assets/Rearviewframe.png")
-        overlay_image = QImage(frame_image.size(), QImage.Format_ARGB32)
-        # overlay_image.fill(Qt.transparent)
-
-        painter = QPainter(overlay_image)
-        painter.drawPixmap(0, 0, frame_image)
+        painter = QPainter(self._overlay_buf)
+        # Source mode overwrites the previous frame, so the buffer never needs clearing
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        painter.drawPixmap(0, 0, self._rearview_frame)
         painter.setCompositionMode(QPainter.CompositionMode_SourceIn)
         painter.drawImage(5, 5, image)
         painter.end()
 
-        self.camera_label.setPixmap(QPixmap.fromImage(overlay_image))
+        self.camera_label.setPixmap(QPixmap.fromImage(self._overlay_buf))
 
     def Mainwindow(self):
-        self.button1_clicked = True
-        self.load_html_file("http://127.0.0.1:5500/GUI/Beaglebone/Dashboard/mapV2.html")
         self.camera_label.setGeometry(QRect(185, 340, 631 , 230))
-        self.hide()
-        self.button1_clicked = False
+        self._switch('main')
 
     def Temps(self):
-        self.button2_clicked = True
-        self.hide()
-        self.button2_clicked = False
-        
+        self._switch('temps')
 
     def Current(self):
-        self.button3_clicked = True
-        self.hide()
-        self.button3_clicked = False
-        
+        self._switch('current')
+
     def CPanel(self):
-        self.button4_clicked = True
-        self.hide()
-        self.button4_clicked = False
+        self._switch('cpanel')
 
 class Camera(QThread):
     ImageUpdate = pyqtSignal(QImage)
+    FRAME_INTERVAL = 0.066  # seconds, ~15 FPS is plenty for the rear view
+    CAPTURE_SIZE = (640, 240)
+    DISPLAY_SIZE = (620, 215)  # camera area inside the rear view frame
+    # Qt 5.14+ wraps OpenCV's BGR bytes directly; older Qt needs a cvtColor pass to RGB
+    QT_FORMAT = getattr(QImage, 'Format_BGR888', QImage.Format_RGB888)
+
+    def start(self):
+        # Set here rather than in run() so a stop() that lands before run() begins still counts
+        self.ThreadActive = True
+        super().start()
 
     def run(self):
-        self.ThreadActive = True
-        capture = cv2.VideoCapture(0)
-        while self.ThreadActive:
-            ret, frame = capture.read()
-            if ret:
-                image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        # A grabber thread only pulls frames off the camera while this thread converts them.
+        # The queue holds two frames; when it is full the grabber drops frames instead of queuing.
+        self._frames = Queue(maxsize=2)
+        grabber = threading.Thread(target=self._grab_frames, daemon=True)
+        grabber.start()
+        try:
+            while self.ThreadActive:
+                try:
+                    frame = self._frames.get(timeout=self.FRAME_INTERVAL)
+                except Empty:
+                    continue
+                # Shrink to the display size here, off the GUI thread, so the painter only
+                # copies the frame and the colour conversion and flip run on the small frame
+                image = frame
+                if (image.shape[1], image.shape[0]) != self.DISPLAY_SIZE:
+                    image = cv2.resize(image, self.DISPLAY_SIZE)
+                if self.QT_FORMAT == QImage.Format_RGB888:
+                    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
                 flipped_image = cv2.flip(image, 1)
-                convert_to_qt_format = QImage(flipped_image.data, flipped_image.shape[1], flipped_image.shape[0],
-                                              QImage.Format_RGB888)
-                pic = convert_to_qt_format.scaled(620, 215)
-                self.ImageUpdate.emit(pic)
+                height, width = flipped_image.shape[:2]
+                convert_to_qt_format = QImage(flipped_image.data, width, height, width * 3, self.QT_FORMAT)
+                self.ImageUpdate.emit(convert_to_qt_format.copy())
+        finally:
+            self.ThreadActive = False
+            grabber.join()
+
+    def _grab_frames(self):
+        capture = cv2.VideoCapture(0)
+        # Ask the camera for MJPEG frames close to the display size
+        capture.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+        capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.CAPTURE_SIZE[0])
+        capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.CAPTURE_SIZE[1])
+        last_decode = 0.0
+        try:
+            while self.ThreadActive:
+                # grab() only advances the stream, frames are decoded at most once per FRAME_INTERVAL
+                if not capture.grab():
+                    # No camera or a dropped frame, back off instead of spinning
+                    time.sleep(self.FRAME_INTERVAL)
+                    continue
+                now = time.monotonic()
+                if now - last_decode < self.FRAME_INTERVAL or self._frames.full():
+                    continue
+                last_decode = now
+                ret, frame = capture.retrieve()
+                if ret:
+                    self._frames.put_nowait(frame)
+        finally:
+            # Free /dev/video0 so the next start() can open it again
+            capture.release()
 
     def stop(self):
+        # run() has no event loop, so quit() did nothing; let the loop finish and reap the thread
         self.ThreadActive = False
-        self.quit()
+        self.wait(200)
 
 
 if __name__ == "__main__":
@@ -1,6 +1,7 @@
 import numpy as np
-from datetime import datetime, timedelta
-from config import PanelArea, PanelEfficiency, RaceStartTime, RaceEndTime
+from datetime import datetime
+from config import PanelArea, PanelEfficiency
+from state import RaceStartTime, RaceEndTime
 
 # Constants
 G_s = 1366  # Solar constant in W/m^2
@@ -34,42 +35,41 @@ def sun_declination_angle(N):
     return 23.45 * np.sin(np.radians(360 / 365 * (284 + N)))
 
 # Function to calculate solar irradiance (G_b)
-def solar_irradiance(G_s_prime, latitude, declination, hour_angle):
-    latitude_rad = np.radians(latitude)
+# sin/cos of the latitude come from the RouteContext, they do not change between iterations.
+# The latitude terms are combined per location first, so when hour_angle carries an extra
+# time axis (time[:, None] against a route) only the final product has the full (T, L) shape
+def solar_irradiance(G_s_prime, sin_lat, cos_lat, declination, hour_angle):
     declination_rad = np.radians(declination)
-    hour_angle_rad = np.radians(hour_angle)
-    return G_s_prime * (np.cos(latitude_rad) * np.cos(declination_rad) * np.cos(hour_angle_rad) + np.sin(latitude_rad) * np.sin(declination_rad))
+    horizontal = G_s_prime * np.cos(declination_rad) * cos_lat
+    vertical = G_s_prime * np.sin(declination_rad) * sin_lat
+    G_b = np.cos(np.radians(hour_angle))
+    G_b *= horizontal
+    G_b += vertical
+    return G_b
+
+# Assume a fixed date for simplicity, can be changed as needed.
+# Everything that depends only on the date is evaluated once here instead of on every call
+_N = day_of_year(datetime.now())  # day of the year
+_E = equation_of_time(calculate_B(_N))  # equation of time
+_delta = sun_declination_angle(_N)  # sun declination angle
 
 # Main function to calculate incident solar power
-def calculate_incident_solarpower(globaltime, latitude_array, longitude_array):
-    # Assume a fixed date for simplicity, can be changed as needed
-    date = datetime.now()
-
-    # Calculate the day of the year
-    N = day_of_year(date)
-    B = calculate_B(N)
-
-    # Calculate the standard meridian
-    standard_meridian = 15 * (longitude_array / 15).astype(int)
-
-    # Calculate the equation of time
-    E = equation_of_time(B)
-
-    time = globaltime % DT
+# globaltime is either matched to the route points or globaltime[:, None] for a (T, L) sweep
+def calculate_incident_solarpower(globaltime, ctx):
+    # Clock time of each point, same convention as solar.py
+    time = RaceStartTime + globaltime % DT
 
     # Calculate the standard time in hours (decimal)
     standard_time = time / 3600
 
     # Calculate the solar local time for each point
-    T_s = solar_local_time(standard_time, longitude_array, standard_meridian, E)
+    T_s = solar_local_time(standard_time, ctx.longitude, ctx.standard_meridian, _E)
     # Calculate the hour angle for each point
     omega = hour_angle(T_s)
-    # Calculate the sun declination angle
-    delta = sun_declination_angle(N)
     # Calculate the solar irradiance for each point
-    G_b = solar_irradiance(G_s_prime, latitude_array, delta, omega)
-    
-    return G_b * _power_coeff
+    G_b = solar_irradiance(G_s_prime, ctx.sin_lat, ctx.cos_lat, _delta, omega)
+    G_b *= _power_coeff
+    return G_b
 
 # # Example usage
 # if __name__ == "__main__":
@@ -1,5 +1,11 @@
 import numpy as np
 
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional, calculate_power falls back to NumPy without it
+    njit = None
+    prange = range
+
 from config import (
     Mass, ZeroSpeedCrr, AirDensity, CDA, R_Out, Ta,
     GravityAcc,
@@ -15,44 +21,193 @@ _slope_coeff = Mass * GravityAcc
 
 _windage_losses_coeff_wR2 = (170.4 * (10**-6)) / (R_Out **2)
 
+# Below this many segments the thread start-up of the parallel kernel costs more than it saves
+_PARALLEL_MIN_SIZE = 4096
 
-def calculate_power(speed, acceleration, slope):
-    speed2 = speed ** 2
 
-    # t = r_out * ((m * 9.81 * u1) + (0.5 * Cd * a * rho * (omega ** 2) * (r_out ** 2)))
-    drag_tou = _drag_coeff_wR2 * (speed2)
-    tou = _frictional_tou + drag_tou
-    
+def _winding_losses(s2, tou):
     # Finding winding temperature
     Tw_i = Ta
-
     while True:
-        # B = 1.32 - 1.2 * 10**-3 * (Ta / 2 + Tw_i / 2 - 293)
         B = 1.6716 - 0.0006 * (Ta + Tw_i)  # magnetic remanence
         i = 0.561 * B * tou  # RMS phase current
-
-        # R = 0.0575 * (1 + 0.0039 * (Tw_i - 293))
         resistance = 0.00022425 * Tw_i - 0.00820525  # resistance of windings
-        
         Pc = 3 * i ** 2 * resistance  # copper (ohmic) losses
-        Pe = (9.602 * (10**-6) * ((B/R_Out) ** 2) / resistance) * speed2  # eddy current losses
+        Pe = (9.602 * (10**-6) * ((B/R_Out) ** 2) / resistance) * s2  # eddy current losses
         Tw = 0.455 * (Pc + Pe) + Ta
-    
-        cond = np.abs(Tw - Tw_i) < 0.001
-        if np.all(cond):
-            break
+        if abs(Tw - Tw_i) < 0.001:
+            return Pc, Pe, B, resistance
+        Tw_i = Tw
+
+
+def segment_power(s, acceleration, sin_slope):
+    # (P_net, P_out) of a single segment
+    s2 = s * s
+    tou = _frictional_tou + _drag_coeff_wR2 * s2
+
+    Pc, Pe, _, _ = _winding_losses(s2, tou)
+
+    P_out = tou * s / R_Out  # output power
+    Pw = s2 * _windage_losses_coeff_wR2  # windage losses
+    P_acc = (Mass * acceleration + _slope_coeff * sin_slope) * s
+
+    P = P_out + Pw + Pc + Pe + P_acc
+    return (P if P > 0 else 0.0), P_out
+
+
+def _power_loop(speed, acceleration, sin_slope, P_net, P_out):
+    # Same model as _calculate_power_numpy, one segment at a time so the
+    # winding temperature iteration stays in registers
+    for k in prange(speed.shape[0]):
+        P_net[k], P_out[k] = segment_power(speed[k], acceleration[k], sin_slope[k])
+
+
+def _power_grad_loop(speed, acceleration, sin_slope, dP_ds, dP_da, dPO_ds):
+    # Partial derivatives of P_net (and P_out) from _power_loop w.r.t. speed and acceleration.
+    # The losses L = Pc + Pe sit at the fixed point Tw = 0.455 * L(s, Tw) + Ta, so by the
+    # implicit function theorem dL/ds = L_s / (1 - 0.455 * L_T)
+    for k in range(speed.shape[0]):
+        s = speed[k]
+        s2 = s * s
+        tou = _frictional_tou + _drag_coeff_wR2 * s2
+
+        Pc, Pe, B, resistance = _winding_losses(s2, tou)
+
+        P_out = tou * s / R_Out
+        dtou_ds = 2 * _drag_coeff_wR2 * s
+        dPO_ds[k] = (tou + s * dtou_ds) / R_Out
+        Pw = s2 * _windage_losses_coeff_wR2
+        P_acc = (Mass * acceleration[k] + _slope_coeff * sin_slope[k]) * s
+        if P_out + Pw + Pc + Pe + P_acc <= 0:  # clipped to zero
+            dP_ds[k] = 0.0
+            dP_da[k] = 0.0
+            continue
+
+        L_s = 2 * Pc * dtou_ds / tou + 2 * Pe / s
+        L_T = Pc * (-0.0012 / B + 0.00022425 / resistance) + Pe * (-0.0012 / B - 0.00022425 / resistance)
+        dL_ds = L_s / (1 - 0.455 * L_T)
+
+        dP_ds[k] = (
+            dPO_ds[k] + 2 * s * _windage_losses_coeff_wR2 + dL_ds
+            + Mass * acceleration[k] + _slope_coeff * sin_slope[k]
+        )
+        dP_da[k] = Mass * s
 
-        Tw_i = np.where(cond, Tw_i, Tw)
+
+# No cache=True: the kernels freeze the config.py constants at compile time, and Numba's
+# on-disk cache is not invalidated when config.py changes
+if njit is not None:
+    _winding_losses = njit(fastmath=True)(_winding_losses)
+    segment_power = njit(fastmath=True)(segment_power)
+    _power_kernel = njit(fastmath=True)(_power_loop)
+    _power_kernel_parallel = njit(parallel=True, fastmath=True)(_power_loop)
+    _power_grad_kernel = njit(fastmath=True)(_power_grad_loop)
+else:
+    _power_grad_kernel = _power_grad_loop
+
+
+def _calculate_power_numpy(speed, acceleration, sin_slope, P_net, P_out):
+    # Same signature as _power_loop; temporaries are built with in-place ufuncs
+    speed2 = np.square(speed)
+
+    # t = r_out * ((m * 9.81 * u1) + (0.5 * Cd * a * rho * (omega ** 2) * (r_out ** 2)))
+    tou = np.multiply(speed2, _drag_coeff_wR2)
+    tou += _frictional_tou
+
+    # Finding winding temperature
+    # With i = 0.561 * B * tou the losses factor into B**2 times a per-segment constant:
+    # Pc = 3 * i**2 * R = copper * B**2 * R and Pe = eddy * B**2 / R
+    copper = np.square(tou)
+    copper *= 3 * 0.561 ** 2
+    eddy = np.multiply(speed2, 9.602 * (10**-6) / R_Out ** 2)
+    Tw_i = np.full_like(speed, Ta)
+
+    # Full-array passes while most segments are still iterating, then only the
+    # unconverged tail is recomputed and scattered back into Pc/Pe
+    active = None
+    while True:
+        if active is None:
+            copper_a, eddy_a, Tw_a = copper, eddy, Tw_i
+        else:
+            copper_a, eddy_a, Tw_a = copper[active], eddy[active], Tw_i[active]
+
+        # B = 1.32 - 1.2 * 10**-3 * (Ta / 2 + Tw_i / 2 - 293)
+        B = 1.6716 - 0.0006 * (Ta + Tw_a)  # magnetic remanence
+        B2 = B * B
+
+        # R = 0.0575 * (1 + 0.0039 * (Tw_i - 293))
+        resistance = 0.00022425 * Tw_a - 0.00820525  # resistance of windings
+
+        Pc_a = copper_a * B2 * resistance  # copper (ohmic) losses
+        Pe_a = eddy_a * B2 / resistance  # eddy current losses
+        Tw = 0.455 * (Pc_a + Pe_a) + Ta
+
+        cond = np.abs(Tw - Tw_a) < 0.001
+        if active is None:
+            Pc, Pe = Pc_a, Pe_a
+            if np.all(cond):
+                break
+            moving = np.logical_not(cond, out=cond)
+            np.copyto(Tw_i, Tw, where=moving)
+            if np.count_nonzero(moving) * 2 < moving.shape[0]:
+                active = np.flatnonzero(moving)
+        else:
+            Pc[active] = Pc_a
+            Pe[active] = Pe_a
+            moving = np.logical_not(cond, out=cond)
+            np.copyto(Tw_a, Tw, where=moving)
+            Tw_i[active] = Tw_a
+            active = active[moving]
+            if not active.size:
+                break
 
     # Final eta calculations
-    P_out = tou * speed / R_Out  # output power
-    Pw = (speed2) * _windage_losses_coeff_wR2 # windage losses
+    np.multiply(tou, speed, out=P_out)
+    P_out /= R_Out  # output power
+    Pw = speed2
+    Pw *= _windage_losses_coeff_wR2  # windage losses
+
+    # Slope term in a single buffer, sin(slope) is a route constant from the RouteContext
+    P_acc = np.multiply(sin_slope, _slope_coeff)
+    P_acc += Mass * acceleration
+    P_acc *= speed
+
+    np.add(P_out, Pw, out=P_net)
+    P_net += Pc
+    P_net += Pe
+    P_net += P_acc
+    np.clip(P_net, 0, None, out=P_net)
+
+
+def calculate_power(speed, acceleration, sin_slope, out=None):
+    # out=(P_net, P_out) writes into existing buffers, like the ufunc out= argument
+    if out is None:
+        P_net = np.empty_like(speed)
+        P_out = np.empty_like(speed)
+    else:
+        P_net, P_out = out
 
-    P_acc = (Mass * acceleration + _slope_coeff * np.sin(np.radians(slope))) * speed
+    if njit is None:
+        kernel = _calculate_power_numpy
+    elif speed.shape[0] >= _PARALLEL_MIN_SIZE:
+        kernel = _power_kernel_parallel
+    else:
+        kernel = _power_kernel
+    kernel(speed, acceleration, sin_slope, P_net, P_out)
+    return P_net, P_out
 
-    P_net = P_out + Pw + Pc + Pe + P_acc
-    return P_net.clip(0), P_out
+def calculate_dt(start_speed, stop_speed, dx, out=None):
+    # dt = 2 * dx / (start_speed + stop_speed + EPSILON), in one buffer
+    dt = np.add(start_speed, stop_speed, out=out)
+    dt += EPSILON
+    np.divide(dx, dt, out=dt)
+    dt *= 2
+    return dt
 
-def calculate_dt(start_speed, stop_speed, dx):
-    dt = 2 * dx / (start_speed + stop_speed + EPSILON)
-    return dt
\ No newline at end of file
+def calculate_power_grad(speed, acceleration, sin_slope):
+    # (dP_net/dspeed, dP_net/dacceleration, dP_out/dspeed) for each segment
+    dP_ds = np.empty_like(speed)
+    dP_da = np.empty_like(speed)
+    dPO_ds = np.empty_like(speed)
+    _power_grad_kernel(speed, acceleration, sin_slope, dP_ds, dP_da, dPO_ds)
+    return dP_ds, dP_da, dPO_ds
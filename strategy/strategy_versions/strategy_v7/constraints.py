@@ -1,9 +1,14 @@
 import numpy as np
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional, _simulate falls back to NumPy without it
+    njit = None
+
 from config import BatteryCapacity, DeepDischargeCap, MaxVelocity, Mass, MaxCurrent, BusVoltage
 import state
-from car import calculate_dt, calculate_power
-from solar import calculate_incident_solarpower
+from car import EPSILON, calculate_dt, calculate_power, calculate_power_grad, segment_power
+from solar import solar_along_route, calculate_incident_solarpower_rate, solar_at, solar_power_lut
 
 SafeBatteryLevel = BatteryCapacity * (DeepDischargeCap)
 MaxPower = MaxCurrent * BusVoltage
@@ -12,36 +17,205 @@ MaxPower = MaxCurrent * BusVoltage
 def get_bounds(N):
     return ([(0, 0)] + [(0.01, MaxVelocity)]*(N-2) + [(0, 0)])
 
-def objective(velocity_profile, segment_array):
-    dt = calculate_dt(velocity_profile[:-1], velocity_profile[1:], segment_array)
+def objective(velocity_profile, ctx):
+    dt = calculate_dt(velocity_profile[:-1], velocity_profile[1:], ctx.segment)
     return np.sum(dt)
 
-def battery_acc_constraint_func(v_prof, segment_array, slope_array, lattitude_array, longitude_array):
-    start_speeds, stop_speeds = v_prof[:-1], v_prof[1:]
+def objective_jac(velocity_profile, ctx):
+    # dt_i = 2 * x_i / (v_i + v_i+1), so v_k shows up in the segments on either side of it
+    ddt = -2 * ctx.segment / (velocity_profile[:-1] + velocity_profile[1:] + EPSILON)**2
+    jac = np.zeros_like(velocity_profile)
+    jac[:-1] += ddt
+    jac[1:] += ddt
+    return jac
+
+class Workspace:
+    # Buffers for one optimisation, built once in model.main and reused by every constraint
+    # call instead of allocating fresh arrays each SciPy iteration. Both constraints are
+    # evaluated at the same velocity profile, so the workspace also remembers which profile
+    # its simulation and Jacobian buffers currently hold
+    def __init__(self, n):
+        self.v_prof = np.empty(n + 1)
+        self.avg_speed = np.empty(n)
+        self.dt = np.empty(n)
+        self.acceleration = np.empty(n)
+        self.P = np.empty(n)
+        self.PO = np.empty(n)
+        self.SolP = np.empty(n)
+        self.net_energy = np.empty(n)
+        self.energy_consumption = np.empty(n)
+        self.J_energy = np.empty((n, n + 1))
+        self.dh_start = np.empty(n)
+        self.dh_stop = np.empty(n)
+        # Reductions of the simulation that the constraints return
+        self.max_energy = np.nan
+        self.max_acc_over = np.nan
+        self.simulated = None
+        self.differentiated = None
+
+def _simulate(v_prof, ctx, ws):
+    key = v_prof.tobytes()
+    if ws.simulated == key:
+        return ws
+
+    # Segment i only depends on v_i and v_i+1, so everything before the first changed
+    # speed is still valid. Only the tail from there on is recomputed
+    k = 0
+    if ws.simulated is not None:
+        k = max(int(np.argmax(v_prof != ws.v_prof)) - 1, 0)
+    ws.v_prof[:] = v_prof
+
+    if njit is None:
+        _simulate_numpy(v_prof, ctx, ws, k)
+    else:
+        ws.max_energy, ws.max_acc_over = _simulate_kernel(
+            v_prof, ctx.segment, ctx.sin_slope, state.TimeOffset, k, solar_power_lut,
+            ws.avg_speed, ws.dt, ws.acceleration, ws.P, ws.PO, ws.SolP,
+            ws.net_energy, ws.energy_consumption,
+        )
+
+    ws.simulated = key
+    return ws
+
+def _simulate_loop(v_prof, segment, sin_slope, time_offset, start, lut,
+                   avg_speed, dt, acceleration, P, PO, SolP, net_energy, energy_consumption):
+    # The whole pipeline of _simulate_numpy fused into one pass over the segments. Segments
+    # before `start` are still valid and only read back for the running time, the energy
+    # cumsum and the two reductions the constraints need
+    t = 0.0
+    net = 0.0
+    max_energy = -np.inf
+    max_acc_over = -np.inf
+    for i in range(dt.shape[0]):
+        if i >= start:
+            a = v_prof[i]
+            b = v_prof[i + 1]
+            avg_speed[i] = (a + b) / 2
+            dt[i] = 2 * segment[i] / (a + b + EPSILON)
+            acceleration[i] = (b - a) / dt[i]
+            P[i], PO[i] = segment_power(avg_speed[i], acceleration[i], sin_slope[i])
+            t += dt[i]
+            SolP[i] = solar_at(t + time_offset, lut)
+            net += (P[i] - SolP[i]) * dt[i]
+            net_energy[i] = net
+            energy_consumption[i] = net / 3600
+        else:
+            t += dt[i]
+            net = net_energy[i]
+
+        max_energy = max(max_energy, energy_consumption[i])
+        acc_over = max(PO[i], 0.0) / (Mass * avg_speed[i]) - acceleration[i]
+        max_acc_over = max(max_acc_over, acc_over)
+
+    return max_energy, max_acc_over
+
+
+# Not cached on disk, the kernel freezes Mass, EPSILON and the inlined car and solar
+# kernels at compile time and the cache would not see config.py or state.py change
+if njit is not None:
+    _simulate_kernel = njit(_simulate_loop)
+
+def _simulate_numpy(v_prof, ctx, ws, k):
+    start_speeds, stop_speeds = v_prof[k:-1], v_prof[k + 1:]
     
-    avg_speed = (start_speeds + stop_speeds) / 2
-    dt = calculate_dt(start_speeds, stop_speeds, segment_array)
-    acceleration = (stop_speeds - start_speeds) / dt
+    avg_speed = np.add(start_speeds, stop_speeds, out=ws.avg_speed[k:])
+    avg_speed /= 2
+    dt = calculate_dt(start_speeds, stop_speeds, ctx.segment[k:], out=ws.dt[k:])
+    acceleration = np.subtract(stop_speeds, start_speeds, out=ws.acceleration[k:])
+    acceleration /= dt
+
+    calculate_power(avg_speed, acceleration, ctx.sin_slope[k:], out=(ws.P[k:], ws.PO[k:]))
+    elapsed = ws.dt[:k].cumsum()[-1] if k else 0.0
+    solar_along_route(dt, state.TimeOffset, ctx, out=ws.SolP[k:], elapsed=elapsed)
 
-    P, PO = calculate_power(avg_speed, acceleration, slope_array)
-    SolP = calculate_incident_solarpower(dt.cumsum() + state.TimeOffset, lattitude_array, longitude_array)
+    # energy_consumption = ((P - SolP) * dt).cumsum() / 3600, the cumsum carried on from k
+    net_energy = np.subtract(ws.P[k:], ws.SolP[k:], out=ws.net_energy[k:])
+    net_energy *= dt
+    if k:
+        net_energy[0] += ws.net_energy[k - 1]
+    np.cumsum(net_energy, out=net_energy)
+    np.divide(net_energy, 3600, out=ws.energy_consumption[k:])
 
-    energy_consumption = ((P - SolP) * dt).cumsum() / 3600
-    battery_profile = state.InitialBatteryCapacity - energy_consumption - SafeBatteryLevel
+    ws.max_energy = np.max(ws.energy_consumption)
+    ws.max_acc_over = np.max(ws.PO.clip(0)/(Mass * ws.avg_speed) - ws.acceleration)
 
-    return np.min(battery_profile), np.max(PO.clip(0)/(Mass * avg_speed) - acceleration), 
+def battery_acc_constraint_func(v_prof, ctx, ws):
+    ws = _simulate(v_prof, ctx, ws)
+    # The lowest battery level is where the most energy has been used
+    min_battery = state.InitialBatteryCapacity - ws.max_energy - SafeBatteryLevel
+
+    return min_battery, ws.max_acc_over, 
 # , MaxPower - np.max(P)
 
-def final_battery_constraint_func(v_prof, segment_array, slope_array, lattitude_array, longitude_array):
-    start_speeds, stop_speeds = v_prof[:-1], v_prof[1:]
-    
-    avg_speed = (start_speeds + stop_speeds) / 2
-    dt = calculate_dt(start_speeds, stop_speeds, segment_array)
-    acceleration = (stop_speeds - start_speeds) / dt
+def final_battery_constraint_func(v_prof, ctx, ws):
+    ws = _simulate(v_prof, ctx, ws)
+    final_battery_lev = state.InitialBatteryCapacity - ws.energy_consumption[-1] - state.FinalBatteryCapacity
+    return final_battery_lev, -final_battery_lev
+
+# Jacobians of the constraints above. Segment i only depends on its end speeds v_i and
+# v_i+1, but the solar power and the energy integral carry that through every later segment,
+# so d(energy_consumption)/dv is lower triangular. SLSQP needs it dense
+def _simulate_jac(v_prof, ctx, ws):
+    # Simulate first even on a cache hit, the callers read the simulation buffers too and
+    # they may have moved on to another profile since the Jacobian was cached
+    ws = _simulate(v_prof, ctx, ws)
+    key = v_prof.tobytes()
+    if ws.differentiated == key:
+        return ws.J_energy, ws.dh_start, ws.dh_stop
+
+    avg_speed, acceleration, dt = ws.avg_speed, ws.acceleration, ws.dt
+    n = dt.shape[0]
+    rows = np.arange(n)
+
+    # d/dv_i and d/dv_i+1 of the per-segment quantities
+    ddt = -2 * ctx.segment / (v_prof[:-1] + v_prof[1:] + EPSILON)**2
+    dacc_start = (-1 - acceleration * ddt) / dt
+    dacc_stop = (1 - acceleration * ddt) / dt
+
+    dP_ds, dP_da, dPO_ds = calculate_power_grad(avg_speed, acceleration, ctx.sin_slope)
+    dP_start = 0.5 * dP_ds + dP_da * dacc_start
+    dP_stop = 0.5 * dP_ds + dP_da * dacc_stop
+
+    # d(time at the end of segment i)/dv
+    J_energy = ws.J_energy
+    J_energy.fill(0)
+    J_energy[rows, rows] = ddt
+    J_energy[rows, rows + 1] = ddt
+    np.cumsum(J_energy, axis=0, out=J_energy)
+
+    globaltime = dt.cumsum()
+    globaltime += state.TimeOffset
+    dSolP_dt = calculate_incident_solarpower_rate(globaltime, ctx)
+
+    # energy_consumption = ((P - SolP) * dt).cumsum() / 3600
+    net_power = ws.P - ws.SolP
+    J_energy *= (-dSolP_dt * dt)[:, None]
+    J_energy[rows, rows] += dP_start * dt + net_power * ddt
+    J_energy[rows, rows + 1] += dP_stop * dt + net_power * ddt
+    np.cumsum(J_energy, axis=0, out=J_energy)
+    J_energy /= 3600
+
+    # PO / (Mass * avg_speed) - acceleration
+    dh_ds = (dPO_ds * avg_speed - ws.PO) / (Mass * avg_speed**2)
+    np.subtract(0.5 * dh_ds, dacc_start, out=ws.dh_start)
+    np.subtract(0.5 * dh_ds, dacc_stop, out=ws.dh_stop)
+
+    ws.differentiated = key
+    return J_energy, ws.dh_start, ws.dh_stop
+
+def battery_acc_constraint_jac(v_prof, ctx, ws):
+    J_energy, dh_start, dh_stop = _simulate_jac(v_prof, ctx, ws)
+
+    # min/max are taken by a single segment, the gradient is that segment's
+    k_battery = np.argmax(ws.energy_consumption)
+    k_acc = np.argmax(ws.PO.clip(0)/(Mass * ws.avg_speed) - ws.acceleration)
 
-    P, _= calculate_power(avg_speed, acceleration, slope_array)
-    SolP = calculate_incident_solarpower(dt.cumsum() + state.TimeOffset, lattitude_array, longitude_array)
+    jac = np.zeros((2, v_prof.shape[0]))
+    jac[0] = -J_energy[k_battery]
+    jac[1, k_acc] = dh_start[k_acc]
+    jac[1, k_acc + 1] = dh_stop[k_acc]
+    return jac
 
-    energy_consumption = ((P - SolP) * dt).cumsum() / 3600
-    final_battery_lev = state.InitialBatteryCapacity - energy_consumption[-1] - state.FinalBatteryCapacity
-    return final_battery_lev, -final_battery_lev
\ No newline at end of file
+def final_battery_constraint_jac(v_prof, ctx, ws):
+    J_energy, _, _ = _simulate_jac(v_prof, ctx, ws)
+    return np.stack((-J_energy[-1], J_energy[-1]))
@@ -4,35 +4,49 @@ import pandas as pd
 
 import config
 import state
-from constraints import get_bounds, objective, battery_acc_constraint_func, final_battery_constraint_func
+from constraints import (
+    Workspace, get_bounds, objective, objective_jac,
+    battery_acc_constraint_func, battery_acc_constraint_jac,
+    final_battery_constraint_func, final_battery_constraint_jac,
+)
 from profiles import extract_profiles
+from route import RouteContext
+
+# Progress output is configured differently by each solver. SLSQP stops at 100 iterations
+# by default, which is not enough for the longer legs, so it gets COBYLA's budget of 1000
+_SOLVER_OPTIONS = {
+    "SLSQP": {'disp': True, 'maxiter': 1000},
+    "trust-constr": {'verbose': 3},
+}
+_DEFAULT_SOLVER_OPTIONS = {'disp': True}
+
+# COBYLA is derivative-free and warns when handed gradients
+_GRADIENT_METHODS = {"SLSQP", "trust-constr"}
 
 def main(route_df):
-    segment_array = route_df.iloc[:, 0].to_numpy()
-    slope_array = route_df.iloc[:, 2].to_numpy()
-    lattitude_array = route_df.iloc[:, 3].to_numpy()
-    longitude_array = route_df.iloc[:, 4].to_numpy()
+    ctx = RouteContext.from_route_df(route_df)
 
     N_V = len(route_df) + 1
     velocity_profile = np.ones(N_V) * state.InitialGuessVelocity
 
     bounds = get_bounds(N_V)
+    workspace = Workspace(N_V - 1)
+    use_gradients = state.ModelMethod in _GRADIENT_METHODS
     constraints = [
         {
             "type": "ineq",
             "fun": battery_acc_constraint_func,
-            "args": (
-                segment_array, slope_array, lattitude_array, longitude_array
-            )
+            "args": (ctx, workspace)
         },
         {
             "type": "ineq",
             "fun": final_battery_constraint_func,
-            "args": (
-                segment_array, slope_array, lattitude_array, longitude_array
-            )
+            "args": (ctx, workspace)
         },
     ]
+    if use_gradients:
+        constraints[0]["jac"] = battery_acc_constraint_jac
+        constraints[1]["jac"] = final_battery_constraint_jac
 
 
     print("Starting Optimisation")
@@ -40,17 +54,19 @@ def main(route_df):
 
     optimised_velocity_profile = minimize(
         objective, velocity_profile,
-        args=(segment_array,),
+        args=(ctx,),
+        jac=objective_jac if use_gradients else None,
         bounds=bounds,
         method=state.ModelMethod,
         constraints=constraints,
-        options={
-            'verbose': 3,
-        }
+        options=_SOLVER_OPTIONS.get(state.ModelMethod, _DEFAULT_SOLVER_OPTIONS),
     )
+    if not optimised_velocity_profile.success:
+        # The solver still returns its last iterate, which may break the battery constraints
+        print("WARNING: optimisation did not converge:", optimised_velocity_profile.message)
     optimised_velocity_profile = np.array(optimised_velocity_profile.x)*1
 
-    time_taken = objective(optimised_velocity_profile, segment_array)
+    time_taken = objective(optimised_velocity_profile, ctx)
 
     print("done.")
     print("Total time taken for race:", time_taken, "s")
@@ -58,7 +74,7 @@ def main(route_df):
     outdf = pd.DataFrame(
         dict(zip(
             ['CummulativeDistance', 'Velocity', 'Acceleration', 'Battery', 'EnergyConsumption', 'Solar', 'Time'],
-            extract_profiles(optimised_velocity_profile, segment_array, slope_array, lattitude_array, longitude_array)
+            extract_profiles(optimised_velocity_profile, ctx)
         ))
     )
 
@@ -5,34 +5,57 @@ import state
 from car import calculate_dt, calculate_power
 from solar import calculate_incident_solarpower
 
-def extract_profiles(velocity_profile, segment_array, slope_array, lattitude_array, longitude_array):
+def extract_profiles(velocity_profile, ctx):
+    N = velocity_profile.shape[0]
     start_speeds, stop_speeds = velocity_profile[:-1], velocity_profile[1:]
+
+    # Every profile has one entry per velocity point, the first being the start of the leg,
+    # so the per-segment values are written straight into [1:] of preallocated arrays
+    distances = np.empty(N)
+    acceleration_profile = np.empty(N)
+    battery_profile = np.empty(N)
+    consumption_profile = np.empty(N)
+    gain_profile = np.empty(N)
+    time_profile = np.empty(N)
+
+    distances[0] = 0
+    distances[1:] = ctx.segment
+    acceleration_profile[0] = np.nan
+    consumption_profile[0] = np.nan
+    gain_profile[0] = np.nan
+    battery_profile[0] = state.InitialBatteryCapacity
+    time_profile[0] = 0
     
     avg_speed = (start_speeds + stop_speeds) / 2
-    dt = calculate_dt(start_speeds, stop_speeds, segment_array)
-    acceleration = (stop_speeds - start_speeds) / dt
+    dt = calculate_dt(start_speeds, stop_speeds, ctx.segment)
+    acceleration = np.subtract(stop_speeds, start_speeds, out=acceleration_profile[1:])
+    acceleration /= dt
 
-    P,_ = calculate_power(avg_speed, acceleration, slope_array)
-    SolP = calculate_incident_solarpower(dt.cumsum() + state.TimeOffset, lattitude_array, longitude_array)
+    np.cumsum(dt, out=time_profile[1:])
+    time_profile += state.TimeOffset
 
-    energy_consumption = P * dt /3600
-    energy_gain = SolP * dt /3600
+    P,_ = calculate_power(avg_speed, acceleration, ctx.sin_slope)
+    SolP = calculate_incident_solarpower(time_profile[1:], ctx)
 
-    net_energy_profile = energy_consumption.cumsum() - energy_gain.cumsum()
-    
-    battery_profile = state.InitialBatteryCapacity - net_energy_profile
-    battery_profile = np.concatenate((np.array([state.InitialBatteryCapacity]), battery_profile))
+    energy_consumption = np.multiply(P, dt, out=consumption_profile[1:])
+    energy_consumption /= 3600
+    energy_gain = np.multiply(SolP, dt, out=gain_profile[1:])
+    energy_gain /= 3600
 
-    battery_profile = battery_profile * 100 / (BatteryCapacity)
+    # battery = InitialBatteryCapacity - (consumption.cumsum() - gain.cumsum())
+    net_energy_profile = np.cumsum(energy_consumption, out=battery_profile[1:])
+    net_energy_profile -= energy_gain.cumsum()
+    np.subtract(state.InitialBatteryCapacity, net_energy_profile, out=net_energy_profile)
 
-    distances = np.append([0], segment_array)
+    battery_profile *= 100
+    battery_profile /= BatteryCapacity
 
     return [
         distances,
         velocity_profile,
-        np.concatenate((np.array([np.nan]), acceleration,)),
+        acceleration_profile,
         battery_profile,
-        np.concatenate((np.array([np.nan]), energy_consumption,)),
-        np.concatenate((np.array([np.nan]), energy_gain)),
-        np.concatenate((np.array([0]), dt.cumsum())) + state.TimeOffset,
-    ]
\ No newline at end of file
+        consumption_profile,
+        gain_profile,
+        time_profile,
+    ]
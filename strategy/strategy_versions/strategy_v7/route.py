@@ -0,0 +1,35 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+
+# Route data for one optimisation. Everything here depends only on the route, so it is
+# built once in model.main and handed to the objective and constraints instead of being
+# recomputed on every SciPy iteration.
+@dataclass
+class RouteContext:
+    segment: np.ndarray
+    sin_slope: np.ndarray
+    longitude: np.ndarray
+    standard_meridian: np.ndarray
+    sin_lat: np.ndarray
+    cos_lat: np.ndarray
+
+    @classmethod
+    def from_route_df(cls, route_df):
+        # Only derived terms are kept: the optimiser reads segment and sin_slope, and the
+        # coordinates are only used by the geometric solar model in accurate_solarprofile
+        slope = route_df.iloc[:, 2].to_numpy()
+        latitude = route_df.iloc[:, 3].to_numpy()
+        longitude = route_df.iloc[:, 4].to_numpy()
+        lat_rad = np.radians(latitude)
+        return cls(
+            segment=route_df.iloc[:, 0].to_numpy(),
+            # calculate_power takes the sine directly
+            sin_slope=np.sin(np.radians(slope)),
+            longitude=longitude,
+            # Time-zone meridian for the geometric solar model in accurate_solarprofile
+            standard_meridian=15 * (longitude / 15).astype(np.int32),
+            sin_lat=np.sin(lat_rad),
+            cos_lat=np.cos(lat_rad),
+        )
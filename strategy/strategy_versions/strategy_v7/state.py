@@ -2,7 +2,7 @@ import config
 import pandas as pd
 
 # Model Settings
-ModelMethod = "COBYLA"
+ModelMethod = "SLSQP"
 InitialGuessVelocity =25
 
 RaceStartTime = 8 * 3600  # 8:00 am